@@ -0,0 +1,328 @@
+# almacen_utils.py
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+import streamlit as st
+
+# ================= CONFIGURACIÓN =================
+DIR_SALIDAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "salidas")
+
+# Tiempo de vida de los archivos generados, contado desde el último acceso
+# (cada petición del reproductor o de la descarga lo renueva), en segundos
+TTL_SALIDAS = 6 * 60 * 60
+INTERVALO_LIMPIEZA = 10 * 60
+
+# Servidor propio para los audios: entrega por bloques, admite Range y no
+# tiene límite de tamaño (el servidor estático de Streamlit corta en 200 MB
+# y sirve los .mp3 como text/plain).
+PUERTO_SALIDAS = int(os.environ.get("PUERTO_SALIDAS", "8502"))
+# URL pública del servidor de salidas si está detrás de un proxy (https://...).
+# Sin ella solo se usa el servidor cuando la app se abre en la propia máquina:
+# en Streamlit Cloud o Codespaces solo se publica el puerto de la app (y por
+# https), así que el navegador no llegaría a http://<host>:8502.
+URL_SALIDAS = os.environ.get("URL_SALIDAS", "").rstrip("/")
+HOSTS_LOCALES = {"localhost", "127.0.0.1", "::1"}
+TAMANO_BLOQUE = 256 * 1024
+
+# Mientras existe "<nombre>.generando" el audio sigue creciendo y la ruta
+# /directo/<nombre> lo emite a medida que se escribe (reproducción progresiva)
+SUFIJO_GENERANDO = ".generando"
+ESPERA_DIRECTO = 0.5
+# Mientras se genera, la marca se renueva cada INTERVALO_LATIDO segundos; una
+# marca más antigua que MARCA_ABANDONADA es de un proceso que murió a medias.
+INTERVALO_LATIDO = 30
+MARCA_ABANDONADA = 3 * INTERVALO_LATIDO
+
+TIPOS_CONTENIDO = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+}
+_NOMBRE_VALIDO = re.compile(r"^[0-9a-f]{32}\.(mp3|wav)$")
+
+_estado = {"iniciado": False, "servidor_ok": False}
+_bloqueo_inicio = threading.Lock()
+_generando = set() # Nombres reservados por este proceso y aún sin finalizar
+_bloqueo_generando = threading.Lock()
+
+# ================= GESTIÓN DE SALIDAS =================
+def limpiar_salidas_caducadas(ttl=TTL_SALIDAS):
+    """Elimina del almacén los archivos sin acceder durante más que el TTL indicado."""
+    if not os.path.isdir(DIR_SALIDAS):
+        return 0
+
+    limite = time.time() - ttl
+    eliminados = 0
+    for nombre in os.listdir(DIR_SALIDAS):
+        ruta = os.path.join(DIR_SALIDAS, nombre)
+        try:
+            if os.path.isfile(ruta) and os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                eliminados += 1
+        except OSError:
+            # Otro proceso/sesión pudo borrarlo antes
+            pass
+    return eliminados
+
+def _renovar(ruta):
+    """Marca un archivo como usado ahora (la mtime hace de último acceso)."""
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+
+def _limpiar_periodicamente():
+    while True:
+        time.sleep(INTERVALO_LIMPIEZA)
+        limpiar_salidas_caducadas()
+
+def _borrar_marcas_generando():
+    """Elimina todas las marcas de generación (al arrancar ninguna sigue viva)."""
+    for nombre in os.listdir(DIR_SALIDAS):
+        if nombre.endswith(SUFIJO_GENERANDO):
+            try:
+                os.remove(os.path.join(DIR_SALIDAS, nombre))
+            except OSError:
+                pass
+
+def _renovar_marcas_periodicamente():
+    """Mantiene al día la mtime de las marcas de las generaciones en curso."""
+    while True:
+        time.sleep(INTERVALO_LATIDO)
+        with _bloqueo_generando:
+            nombres = list(_generando)
+        for nombre in nombres:
+            _renovar(os.path.join(DIR_SALIDAS, nombre + SUFIJO_GENERANDO))
+
+def _generacion_activa(marca):
+    """True si la marca existe y se ha renovado hace poco."""
+    try:
+        return os.path.getmtime(marca) >= time.time() - MARCA_ABANDONADA
+    except OSError:
+        return False
+
+def registrar_salida(ruta_origen, extension=None):
+    """Mueve un archivo generado al almacén y devuelve su nombre dentro de él.
+
+    El archivo deja de existir en `ruta_origen`; a partir de aquí lo gestiona
+    el almacén y se borra cuando caduca su TTL.
+    """
+    os.makedirs(DIR_SALIDAS, exist_ok=True)
+    limpiar_salidas_caducadas()
+
+    if extension is None:
+        extension = os.path.splitext(ruta_origen)[1] or ".mp3"
+    nombre = f"{uuid.uuid4().hex}{extension}"
+
+    # shutil.move copia por bloques si origen y destino están en distintos discos
+    shutil.move(ruta_origen, os.path.join(DIR_SALIDAS, nombre))
+    return nombre
+
+def reservar_salida(extension=".mp3"):
+    """Crea en el almacén un archivo vacío que se irá escribiendo.
+
+    Devuelve (nombre, ruta). Hasta llamar a `finalizar_salida` el archivo se
+    considera en generación y se puede escuchar en directo.
+    """
+    os.makedirs(DIR_SALIDAS, exist_ok=True)
+    nombre = f"{uuid.uuid4().hex}{extension}"
+    ruta = os.path.join(DIR_SALIDAS, nombre)
+    open(ruta, "wb").close()
+    open(ruta + SUFIJO_GENERANDO, "wb").close()
+    with _bloqueo_generando:
+        _generando.add(nombre)
+    return nombre, ruta
+
+def finalizar_salida(nombre):
+    """Marca como terminado un archivo reservado con `reservar_salida`."""
+    with _bloqueo_generando:
+        _generando.discard(nombre)
+    try:
+        os.remove(os.path.join(DIR_SALIDAS, nombre + SUFIJO_GENERANDO))
+    except OSError:
+        pass
+
+def _host_navegador():
+    """Host con el que el navegador ha abierto la app."""
+    host = "localhost"
+    try:
+        host = urlsplit("//" + st.context.headers.get("Host", host)).hostname or host
+    except Exception:
+        pass
+    return host
+
+def url_salida(nombre, nombre_descarga=None, en_directo=False):
+    """URL con la que el navegador obtiene un archivo del almacén.
+
+    Con `nombre_descarga` el servidor responde como adjunto (descarga); con
+    `en_directo` emite el audio mientras se sigue generando (sin Range).
+    """
+    # Sin URL pública, mismo host con el que el navegador ve la app pero en el puerto de salidas
+    base = URL_SALIDAS or f"http://{_host_navegador()}:{PUERTO_SALIDAS}"
+
+    url = f"{base}/directo/{nombre}" if en_directo else f"{base}/{nombre}"
+    if nombre_descarga:
+        url += "?descargar=" + quote(nombre_descarga)
+    return url
+
+# ================= SERVIDOR DE SALIDAS =================
+class _ManejadorSalidas(BaseHTTPRequestHandler):
+    """Entrega archivos del almacén con soporte de peticiones Range."""
+
+    def do_HEAD(self):
+        self._responder(con_cuerpo=False)
+
+    def do_GET(self):
+        self._responder(con_cuerpo=True)
+
+    def log_message(self, formato, *args):
+        pass # Silenciar el log por petición
+
+    def _responder(self, con_cuerpo):
+        partes = urlsplit(self.path)
+        nombre = partes.path.lstrip("/")
+        en_directo = nombre.startswith("directo/")
+        if en_directo:
+            nombre = nombre[len("directo/"):]
+        if not _NOMBRE_VALIDO.match(nombre):
+            self.send_error(404)
+            return
+
+        ruta = os.path.join(DIR_SALIDAS, nombre)
+        try:
+            archivo = open(ruta, "rb")
+        except OSError:
+            self.send_error(404)
+            return
+
+        with archivo:
+            _renovar(ruta)
+            if en_directo:
+                self._emitir_en_directo(archivo, ruta, nombre, con_cuerpo)
+                return
+
+            tamano = os.fstat(archivo.fileno()).st_size
+            rango = self._leer_rango(tamano)
+            if rango is False:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{tamano}")
+                self.end_headers()
+                return
+
+            inicio, fin = rango or (0, tamano - 1)
+            self.send_response(206 if rango else 200)
+            self.send_header("Content-Type", TIPOS_CONTENIDO[os.path.splitext(nombre)[1]])
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(max(0, fin - inicio + 1)))
+            if rango:
+                self.send_header("Content-Range", f"bytes {inicio}-{fin}/{tamano}")
+            descarga = parse_qs(partes.query).get("descargar")
+            if descarga:
+                self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(descarga[0])}")
+            self.end_headers()
+
+            if con_cuerpo:
+                archivo.seek(inicio)
+                self._copiar(archivo, fin - inicio + 1)
+
+    def _emitir_en_directo(self, archivo, ruta, nombre, con_cuerpo):
+        """Emite el audio según se escribe y cierra cuando termina la generación."""
+        # Sin Content-Length: la respuesta (HTTP/1.0) acaba al cerrar la conexión
+        self.send_response(200)
+        self.send_header("Content-Type", TIPOS_CONTENIDO[os.path.splitext(nombre)[1]])
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if not con_cuerpo:
+            return
+
+        marca = ruta + SUFIJO_GENERANDO
+        try:
+            while True:
+                # Comprobar la marca antes de leer para no perder el último bloque.
+                # Una marca abandonada (proceso caído) también cuenta como terminada.
+                terminado = not _generacion_activa(marca)
+                datos = archivo.read(TAMANO_BLOQUE)
+                if datos:
+                    self.wfile.write(datos)
+                elif terminado:
+                    break
+                else:
+                    _renovar(ruta)
+                    time.sleep(ESPERA_DIRECTO)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _leer_rango(self, tamano):
+        """Interpreta la cabecera Range (un solo rango).
+
+        Devuelve None si no hay Range, False si no es satisfacible y
+        (inicio, fin) inclusivo en caso contrario.
+        """
+        cabecera = self.headers.get("Range")
+        if not cabecera:
+            return None
+        coincidencia = re.fullmatch(r"bytes=(\d*)-(\d*)", cabecera.strip())
+        if not coincidencia or coincidencia.groups() == ("", ""):
+            return False
+
+        desde, hasta = coincidencia.groups()
+        if desde == "":
+            # Sufijo: los últimos N bytes
+            inicio, fin = max(0, tamano - int(hasta)), tamano - 1
+        else:
+            inicio = int(desde)
+            fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+        if inicio >= tamano or inicio > fin:
+            return False
+        return inicio, fin
+
+    def _copiar(self, archivo, restante):
+        try:
+            while restante > 0:
+                datos = archivo.read(min(TAMANO_BLOQUE, restante))
+                if not datos:
+                    break
+                self.wfile.write(datos)
+                restante -= len(datos)
+        except (BrokenPipeError, ConnectionResetError):
+            # El navegador cortó la conexión (seek, pausa, pestaña cerrada)
+            pass
+
+def iniciar_almacen():
+    """Arranca (una sola vez por proceso) el servidor de salidas y la limpieza periódica.
+
+    Devuelve True si el servidor está disponible para servir audios.
+    """
+    with _bloqueo_inicio:
+        if not _estado["iniciado"]:
+            _estado["iniciado"] = True
+            os.makedirs(DIR_SALIDAS, exist_ok=True)
+            # Borrar lo que quedó de ejecuciones anteriores y luego cada INTERVALO_LIMPIEZA.
+            # Las marcas de generación se borran siempre: si existen, su proceso murió.
+            _borrar_marcas_generando()
+            limpiar_salidas_caducadas()
+            threading.Thread(target=_limpiar_periodicamente, name="limpieza-salidas", daemon=True).start()
+            threading.Thread(target=_renovar_marcas_periodicamente, name="latido-salidas", daemon=True).start()
+            try:
+                servidor = ThreadingHTTPServer(("0.0.0.0", PUERTO_SALIDAS), _ManejadorSalidas)
+                servidor.daemon_threads = True
+                threading.Thread(target=servidor.serve_forever, name="servidor-salidas", daemon=True).start()
+                _estado["servidor_ok"] = True
+            except OSError:
+                # Puerto ocupado o sin permisos: se usará el reproductor de Streamlit
+                _estado["servidor_ok"] = False
+        return _estado["servidor_ok"]
+
+def salidas_accesibles():
+    """True si el navegador de la sesión actual puede descargar del servidor de salidas.
+
+    Requiere que el servidor esté en marcha y, además, `URL_SALIDAS` o que la
+    app se esté usando en local. Si no, hay que servir el audio desde memoria.
+    """
+    if not iniciar_almacen():
+        return False
+    return bool(URL_SALIDAS) or _host_navegador() in HOSTS_LOCALES
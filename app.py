@@ -17,6 +17,8 @@ from ocr_utils import (
     extraer_texto_documento
 )
 from tts_utils import generar_audio, VOCES
+from planificador_utils import obtener_planificador
+from almacen_utils import iniciar_almacen, salidas_accesibles, URL_SALIDAS
 
 # Variables de estado de sesión
 if 'texto_extraido' not in st.session_state:
@@ -26,6 +28,8 @@ if 'nombre_archivo' not in st.session_state:
 
 # Obtener disponibilidad de librerías al inicio
 DOCX_OK, PYDUB_OK = verificar_librerias()
+ALMACEN_OK = iniciar_almacen()
+SALIDAS_OK = salidas_accesibles()
 
 # ================= FUNCIÓN 1: PDF A WORD (OCR) =================
 def vista_pdf_a_word(tesseract_ok):
@@ -43,17 +47,19 @@ def vista_pdf_a_word(tesseract_ok):
     
     if archivo_subido:
         with st.form("ocr_form"):
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             with col1:
                 auto_rotar = st.checkbox("🔄 Enderezar páginas", True, help="Corrige la orientación de las páginas.")
             with col2:
                 es_libro = st.checkbox("📖 Separar doble página", True, help="Divide páginas con formato de libro.")
+            with col3:
+                preprocesar = st.checkbox("🧹 Limpiar imagen", False, help="Binariza, corrige la inclinación y salta páginas en blanco.")
             
             submit_button = st.form_submit_button("📝 Extraer texto a Word", type="primary", use_container_width=True)
 
         if submit_button:
             with st.spinner("Leyendo PDF con OCR..."):
-                texto = extraer_texto_pdf_ocr(archivo_subido, es_libro, auto_rotar)
+                texto = extraer_texto_pdf_ocr(archivo_subido, es_libro, auto_rotar, preprocesar)
                 
                 if texto and len(texto.strip()) > 50:
                     # Crear documento Word
@@ -103,8 +109,6 @@ def vista_pdf_a_audio(tesseract_ok):
     
     if not tesseract_ok:
         st.warning("⚠️ Necesitas **Tesseract OCR** para esta función.")
-    if not PYDUB_OK:
-        st.info("ℹ️ **pydub** no está instalado. El audio largo será truncado. Instala FFmpeg y pydub.")
         
     texto_a_usar = st.session_state['texto_extraido']
     nombre_base = st.session_state['nombre_archivo']
@@ -122,17 +126,19 @@ def vista_pdf_a_audio(tesseract_ok):
             return
             
         with st.form("ocr_audio_form"):
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             with col1:
                 auto_rotar = st.checkbox("🔄 Enderezar páginas", True, key="auto2")
             with col2:
                 es_libro = st.checkbox("📖 Separar doble página", True, key="libro2")
+            with col3:
+                preprocesar = st.checkbox("🧹 Limpiar imagen", False, key="prepro2")
             
             submit_button = st.form_submit_button("📝 Extraer texto", type="secondary", use_container_width=True)
             
             if submit_button:
                 with st.spinner("Procesando PDF..."):
-                    texto_a_usar = extraer_texto_pdf_ocr(archivo_subido, es_libro, auto_rotar)
+                    texto_a_usar = extraer_texto_pdf_ocr(archivo_subido, es_libro, auto_rotar, preprocesar)
                     nombre_base = archivo_subido.name
                     st.session_state['texto_extraido'] = texto_a_usar
                     st.session_state['nombre_archivo'] = nombre_base
@@ -258,10 +264,30 @@ def main():
         
         # 3. pydub
         if PYDUB_OK:
-            st.success("✅ pydub (Audio largo): OK")
+            st.success("✅ pydub (Voz local de Windows a MP3): OK")
         else:
-            st.warning("⚠️ pydub (Audio largo): Faltante. Audio largo será truncado.")
-            st.info("💡 Necesitas **FFmpeg** instalado en tu sistema además de `pip install pydub`.")
+            st.info("ℹ️ pydub (opcional): Faltante. La voz local de Windows se guardará en WAV en lugar de MP3.")
+        
+        # 4. Servidor de audios
+        if SALIDAS_OK:
+            st.success("✅ Servidor de audio: OK")
+        elif ALMACEN_OK and not URL_SALIDAS:
+            st.info("ℹ️ Servidor de audio: No accesible desde este navegador (define URL_SALIDAS). Los audios se servirán desde memoria.")
+        else:
+            st.warning("⚠️ Servidor de audio: No disponible. Los audios se servirán desde memoria.")
+        
+        # 5. Carga compartida del servidor (OCR/TTS de todas las sesiones)
+        with st.expander("📊 Carga del servidor"):
+            metricas = obtener_planificador().metricas()
+            for etiqueta, clave in [("OCR", "ocr"), ("TTS", "tts")]:
+                m = metricas[clave]
+                st.caption(
+                    f"**{etiqueta}:** {m['en_ejecucion']}/{m['trabajadores']} activos · "
+                    f"{m['en_cola']} en cola ({m['sesiones']} sesiones) · "
+                    f"espera media {m['espera_media_s']:.1f}s, máx. {m['espera_max_s']:.1f}s"
+                )
+            if metricas['memoria_disponible_mb'] is not None:
+                st.caption(f"**Memoria libre:** {metricas['memoria_disponible_mb']:,} MB")
         
         st.divider()
         st.subheader("📁 Funciones")
@@ -0,0 +1,138 @@
+# fixtures_ocr/generar_fixtures.py
+"""Genera el conjunto de páginas de referencia para medir_ocr.py.
+
+Cada fixture es una imagen con aspecto de escaneo (render a zoom 2 de un A4,
+inclinación, iluminación irregular, ruido, motas y compresión JPEG) y un .txt
+con el texto correcto. Un .txt vacío indica una página en blanco.
+
+Requiere la fuente DejaVu Sans (paquete fonts-dejavu o matplotlib).
+
+Uso (desde la raíz del proyecto):
+    python fixtures_ocr/generar_fixtures.py
+"""
+import os
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+DIR_FIXTURES = os.path.dirname(os.path.abspath(__file__))
+ANCHO, ALTO = 1190, 1684 # A4 renderizado con zoom 2, como en renderizar_pagina
+MARGEN = 120
+
+PARRAFOS = [
+    "La mañana en que llegó la carta, Inés estaba sentada junto a la ventana de la cocina. "
+    "El cartero dejó el sobre sobre la mesa sin decir nada, como si supiera que aquel papel "
+    "iba a cambiar la rutina tranquila de la casa durante muchos meses.",
+    "Su abuelo había trabajado toda la vida en el puerto, cargando cajas de fruta y sacos de "
+    "café. Nunca aprendió a leer con soltura, pero guardaba cada documento en una caja de "
+    "lata con la misma atención con la que otros guardan fotografías antiguas.",
+    "Cuando por fin abrió el sobre, encontró una hoja escrita a mano y un pequeño mapa del "
+    "barrio viejo. En una esquina alguien había dibujado una cruz y, debajo, una fecha que "
+    "no entendía: el año en que su madre cumplió diez años.",
+]
+PARRAFOS_2 = [
+    "El archivo municipal abría a las nueve. Inés llegó temprano y esperó en la escalera "
+    "mientras la ciudad despertaba despacio. La empleada le pidió el nombre completo del "
+    "abuelo y desapareció entre estanterías metálicas que olían a polvo y humedad.",
+    "Volvió con una carpeta azul atada con una cinta. Dentro había contratos de alquiler, "
+    "recibos de la luz y una solicitud de licencia para abrir un pequeño taller de "
+    "reparación de bicicletas que, según los papeles, nunca llegó a funcionar.",
+]
+
+def _fuente(tamano):
+    """DejaVu Sans (del sistema o la que trae matplotlib): la fuente por defecto
+    de Pillow no tiene tildes ni eñes."""
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", tamano)
+    except OSError:
+        import matplotlib
+        ruta = os.path.join(os.path.dirname(matplotlib.__file__), "mpl-data", "fonts", "ttf", "DejaVuSans.ttf")
+        return ImageFont.truetype(ruta, tamano)
+
+def _envolver(texto, fuente, ancho):
+    lineas, actual = [], ""
+    for palabra in texto.split():
+        prueba = f"{actual} {palabra}".strip()
+        if fuente.getlength(prueba) <= ancho:
+            actual = prueba
+        else:
+            lineas.append(actual)
+            actual = palabra
+    if actual:
+        lineas.append(actual)
+    return lineas
+
+def _pagina(bloques, ancho=ANCHO, alto=ALTO, y_inicio=MARGEN):
+    """Dibuja bloques (texto, tamaño, espacio_previo) y devuelve (imagen, texto)."""
+    img = Image.new("L", (ancho, alto), 245)
+    dibujo = ImageDraw.Draw(img)
+    y = y_inicio
+    for texto, tamano, espacio in bloques:
+        fuente = _fuente(tamano)
+        y += espacio
+        for linea in _envolver(texto, fuente, ancho - 2 * MARGEN):
+            dibujo.text((MARGEN, y), linea, fill=25, font=fuente)
+            y += int(tamano * 1.45)
+    return img, "\n".join(texto for texto, _, _ in bloques)
+
+def _escanear(img, rng, angulo=0.0, ruido=4.0, sombra=0.0, motas=0, desenfoque=0.6):
+    """Aplica defectos típicos de un escaneo."""
+    if angulo:
+        img = img.rotate(angulo, resample=Image.BICUBIC, fillcolor=245)
+    if desenfoque:
+        img = img.filter(ImageFilter.GaussianBlur(desenfoque))
+    datos = np.asarray(img, dtype=np.float32)
+    if sombra:
+        # Iluminación irregular: oscurece hacia el lomo (borde izquierdo)
+        gradiente = 1.0 - sombra * np.linspace(1, 0, datos.shape[1]) ** 2
+        datos = datos * gradiente[np.newaxis, :]
+    datos = datos + rng.normal(0, ruido, datos.shape)
+    for _ in range(motas):
+        y, x = rng.integers(0, datos.shape[0] - 4), rng.integers(0, datos.shape[1] - 4)
+        lado = int(rng.integers(1, 4))
+        datos[y:y + lado, x:x + lado] = 40
+    return Image.fromarray(np.clip(datos, 0, 255).astype(np.uint8))
+
+def generar():
+    rng = np.random.default_rng(2024)
+    cuerpo = [(p, 26, 18) for p in PARRAFOS]
+    cuerpo_2 = [(p, 26, 18) for p in PARRAFOS_2]
+
+    fixtures = {}
+    img, texto = _pagina(cuerpo)
+    fixtures["01_texto_recto"] = (_escanear(img, rng), texto)
+    img, texto = _pagina(cuerpo_2)
+    fixtures["02_texto_inclinado"] = (_escanear(img, rng, angulo=1.8), texto)
+    img, texto = _pagina(cuerpo)
+    fixtures["03_texto_sombra_lomo"] = (_escanear(img, rng, sombra=0.55, ruido=6), texto)
+    img, texto = _pagina([("CAPÍTULO 3", 48, 0)], y_inicio=700)
+    fixtures["04_titulo_capitulo"] = (_escanear(img, rng, motas=20), texto)
+    img, texto = _pagina([(PARRAFOS_2[1][:90], 26, 0)])
+    fixtures["05_ultima_linea"] = (_escanear(img, rng), texto)
+    fixtures["06_blanco"] = (_escanear(Image.new("L", (ANCHO, ALTO), 245), rng, ruido=3), "")
+    fixtures["07_blanco_ruidoso"] = (
+        _escanear(Image.new("L", (ANCHO, ALTO), 235), rng, ruido=12, sombra=0.3, motas=40), ""
+    )
+
+    # Doble página: izquierda con texto, derecha en blanco (media página vacía)
+    izquierda, texto = _pagina(cuerpo_2)
+    doble = Image.new("L", (2 * ANCHO, ALTO), 245)
+    doble.paste(izquierda, (0, 0))
+    fixtures["08_doble_pagina_media_blanca"] = (_escanear(doble, rng, angulo=-0.8, sombra=0.2), texto)
+
+    # Doble página con texto en ambas mitades
+    izquierda, texto_izq = _pagina(cuerpo)
+    derecha, texto_der = _pagina(cuerpo_2)
+    doble = Image.new("L", (2 * ANCHO, ALTO), 245)
+    doble.paste(izquierda, (0, 0))
+    doble.paste(derecha, (ANCHO, 0))
+    fixtures["09_doble_pagina"] = (_escanear(doble, rng), texto_izq + "\n\n" + texto_der)
+
+    for nombre, (imagen, texto) in fixtures.items():
+        imagen.save(os.path.join(DIR_FIXTURES, nombre + ".jpg"), quality=80)
+        with open(os.path.join(DIR_FIXTURES, nombre + ".txt"), "w", encoding="utf-8") as f:
+            f.write(texto)
+    return list(fixtures)
+
+if __name__ == "__main__":
+    for nombre in generar():
+        print(nombre)
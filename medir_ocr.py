@@ -0,0 +1,122 @@
+# medir_ocr.py
+"""Compara el OCR con y sin preprocesado sobre un conjunto de referencia.
+
+Uso:
+    python medir_ocr.py [carpeta_fixtures] [--auto-rotar]
+
+La carpeta (por defecto fixtures_ocr/) debe contener imágenes de página
+(.png, .jpg, .tif) y, para cada una, un .txt con el mismo nombre con el texto
+correcto (vacío para páginas en blanco). Las imágenes apaisadas se tratan como
+doble página, igual que en la app.
+
+Siempre mide el preprocesado (páginas/segundo y detección de páginas en
+blanco). Si Tesseract está instalado, además compara páginas/segundo y
+precisión por palabras del OCR con y sin preprocesado.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from PIL import Image
+
+from ocr_utils import configurar_tesseract, ocr_imagen
+from preproceso_utils import preprocesar_imagen
+
+DIR_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures_ocr")
+EXTENSIONES_IMAGEN = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+def palabras(texto):
+    return re.findall(r"\w+", texto.lower())
+
+def distancia_edicion(a, b):
+    """Distancia de Levenshtein entre dos listas de palabras."""
+    anterior = list(range(len(b) + 1))
+    for i, pa in enumerate(a, 1):
+        actual = [i]
+        for j, pb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (pa != pb)))
+        anterior = actual
+    return anterior[-1]
+
+def precision_palabras(referencia, obtenido):
+    """1 - WER, acotada a [0, 1]. Una página en blanco acierta si no sale texto."""
+    ref, obt = palabras(referencia), palabras(obtenido)
+    if not ref:
+        return 1.0 if not obt else 0.0
+    return max(0.0, 1.0 - distancia_edicion(ref, obt) / len(ref))
+
+def cargar_fixtures(carpeta):
+    fixtures = []
+    for nombre in sorted(os.listdir(carpeta)):
+        base, extension = os.path.splitext(nombre)
+        ruta_txt = os.path.join(carpeta, base + ".txt")
+        if extension.lower() in EXTENSIONES_IMAGEN and os.path.exists(ruta_txt):
+            with open(ruta_txt, encoding="utf-8") as f:
+                with Image.open(os.path.join(carpeta, nombre)) as img:
+                    fixtures.append((nombre, img.copy(), f.read()))
+    return fixtures
+
+def _mitades(img):
+    """Divide como ocr_imagen con es_doble_pagina=True."""
+    ancho, alto = img.size
+    if ancho > alto:
+        mitad = ancho // 2
+        return [img.crop((0, 0, mitad, alto)), img.crop((mitad, 0, ancho, alto))]
+    return [img]
+
+def medir_preproceso(fixtures):
+    """Tiempo de preprocesado y mitades/páginas que se saltarían por estar en blanco."""
+    filas = []
+    inicio = time.perf_counter()
+    for nombre, img, referencia in fixtures:
+        partes = _mitades(img)
+        saltadas = sum(1 for parte in partes if preprocesar_imagen(parte) is None)
+        esperado_blanco = not palabras(referencia)
+        filas.append((nombre, saltadas, len(partes), esperado_blanco, (saltadas == len(partes)) == esperado_blanco))
+    return len(fixtures) / (time.perf_counter() - inicio), filas
+
+def medir_ocr(fixtures, auto_rotar, preprocesar):
+    precisiones = []
+    inicio = time.perf_counter()
+    for _, img, referencia in fixtures:
+        texto = ocr_imagen(img, True, auto_rotar, preprocesar)
+        precisiones.append(precision_palabras(referencia, texto))
+    duracion = time.perf_counter() - inicio
+    return len(fixtures) / duracion, sum(precisiones) / len(precisiones), precisiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("carpeta", nargs="?", default=DIR_FIXTURES)
+    parser.add_argument("--auto-rotar", action="store_true")
+    args = parser.parse_args()
+
+    fixtures = cargar_fixtures(args.carpeta)
+    if not fixtures:
+        sys.exit("No se encontraron pares imagen/.txt en la carpeta indicada.")
+
+    paginas_s, filas = medir_preproceso(fixtures)
+    print(f"{'página':<34} {'saltadas':>9} {'blanco esperado':>16} {'correcto':>9}")
+    for nombre, saltadas, partes, esperado_blanco, correcto in filas:
+        print(f"{nombre:<34} {f'{saltadas}/{partes}':>9} {'sí' if esperado_blanco else 'no':>16} {'sí' if correcto else 'NO':>9}")
+    errores = sum(1 for fila in filas if not fila[4])
+    print(f"\nPreprocesado: {paginas_s:.2f} páginas/s, {errores} error(es) de detección de páginas en blanco\n")
+
+    tesseract_ok, info = configurar_tesseract()
+    if not tesseract_ok:
+        print(f"Tesseract no disponible ({info}); se omite la comparación de OCR.")
+        return
+
+    resultados = {}
+    for etiqueta, preprocesar in [("original", False), ("preprocesado", True)]:
+        resultados[etiqueta] = medir_ocr(fixtures, args.auto_rotar, preprocesar)
+
+    print(f"{'página':<34} {'original':>10} {'preprocesado':>13}")
+    for i, (nombre, _, _) in enumerate(fixtures):
+        print(f"{nombre:<34} {resultados['original'][2][i]:>10.1%} {resultados['preprocesado'][2][i]:>13.1%}")
+    print()
+    for etiqueta, (paginas_s, precision, _) in resultados.items():
+        print(f"{etiqueta:<13} {paginas_s:6.2f} páginas/s   precisión por palabras {precision:.1%}")
+
+if __name__ == "__main__":
+    main()
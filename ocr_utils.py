@@ -7,9 +7,20 @@ import io
 import os
 import re
 import streamlit as st
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import Future
+from preproceso_utils import preprocesar_imagen
+from planificador_utils import obtener_planificador, id_sesion_actual, SobrecargaError
 
 # ================= CONFIGURACIÓN =================
+# Páginas renderizadas en vuelo por sesión (limita la memoria de imágenes)
+VENTANA_OCR = 4
+
+# Tesseract usa varios hilos OpenMP por defecto. El paralelismo ya lo da el pool
+# OCR del planificador (un proceso por trabajador), así que cada proceso usa uno
+# solo para no sobresuscribir la CPU. Los subprocesos heredan este entorno.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 def configurar_tesseract():
     """Configura Tesseract y devuelve True/False y la ruta/info."""
     try:
@@ -64,14 +75,23 @@ def corregir_orientacion(img):
         pass
     return img, False
 
-def procesar_pagina_ocr(pagina, es_doble_pagina, auto_rotar):
-    """Extrae texto de una página de PDF usando OCR."""
+def renderizar_pagina(pagina):
+    """Renderiza una página de PDF como imagen PIL con alta resolución (zoom 2)."""
+    zoom_matrix = fitz.Matrix(2, 2)
+    pix = pagina.get_pixmap(matrix=zoom_matrix)
+    return Image.open(io.BytesIO(pix.tobytes("png")))
+
+def _ocr_parte(img, preprocesar):
+    """OCR de una página (o media página), saltando las que están en blanco."""
+    if preprocesar:
+        img = preprocesar_imagen(img)
+        if img is None:
+            return ""
+    return pytesseract.image_to_string(img, lang='spa+eng')
+
+def ocr_imagen(img, es_doble_pagina, auto_rotar, preprocesar=False):
+    """Extrae texto de una imagen de página ya renderizada usando OCR."""
     try:
-        # Renderizar la página con alta resolución (zoom 2)
-        zoom_matrix = fitz.Matrix(2, 2)
-        pix = pagina.get_pixmap(matrix=zoom_matrix)
-        img = Image.open(io.BytesIO(pix.tobytes("png")))
-        
         if auto_rotar:
             img, _ = corregir_orientacion(img)
         
@@ -82,17 +102,33 @@ def procesar_pagina_ocr(pagina, es_doble_pagina, auto_rotar):
                 mitad = ancho // 2
                 izquierda = img.crop((0, 0, mitad, alto))
                 derecha = img.crop((mitad, 0, ancho, alto))
-                texto_izq = pytesseract.image_to_string(izquierda, lang='spa+eng')
-                texto_der = pytesseract.image_to_string(derecha, lang='spa+eng')
+                texto_izq = _ocr_parte(izquierda, preprocesar)
+                texto_der = _ocr_parte(derecha, preprocesar)
                 return texto_izq + "\n\n" + texto_der
             
-        return pytesseract.image_to_string(img, lang='spa+eng')
+        return _ocr_parte(img, preprocesar)
     except Exception as e:
         return f"[Error OCR en página: {str(e)[:100]}]"
 
-def extraer_texto_pdf_ocr(archivo_pdf, es_doble_pagina=True, auto_rotar=True):
-    """Extrae texto de PDF completo usando OCR con barra de progreso de Streamlit."""
+def _enviar_pagina_ocr(pool, pagina, es_doble_pagina, auto_rotar, preprocesar, sesion):
+    """Renderiza la página en el hilo de la sesión y encola su OCR en el pool compartido."""
+    try:
+        # PyMuPDF no es seguro entre hilos: el documento solo se toca aquí
+        img = renderizar_pagina(pagina)
+    except Exception as e:
+        futuro = Future()
+        futuro.set_result(f"[Error OCR en página: {str(e)[:100]}]")
+        return futuro
+    return pool.enviar(ocr_imagen, img, es_doble_pagina, auto_rotar, preprocesar, sesion=sesion)
+
+def extraer_texto_pdf_ocr(archivo_pdf, es_doble_pagina=True, auto_rotar=True, preprocesar=False):
+    """Extrae texto de PDF completo usando OCR con barra de progreso de Streamlit.
+
+    El OCR de cada página se ejecuta en el pool compartido del planificador;
+    solo se mantienen VENTANA_OCR páginas renderizadas en memoria a la vez.
+    """
     texto_total = []
+    pendientes = deque()
     archivo_pdf.seek(0)
     
     try:
@@ -100,10 +136,18 @@ def extraer_texto_pdf_ocr(archivo_pdf, es_doble_pagina=True, auto_rotar=True):
         total_paginas = len(doc)
         
         barra = st.progress(0, "Iniciando OCR...")
+        pool = obtener_planificador().ocr
+        sesion = id_sesion_actual()
+        siguiente = 0
         
         for i in range(total_paginas):
-            pagina = doc.load_page(i)
-            texto_pagina = procesar_pagina_ocr(pagina, es_doble_pagina, auto_rotar)
+            # Mantener la ventana de páginas en vuelo llena
+            while siguiente < total_paginas and len(pendientes) < VENTANA_OCR:
+                pagina = doc.load_page(siguiente)
+                pendientes.append(_enviar_pagina_ocr(pool, pagina, es_doble_pagina, auto_rotar, preprocesar, sesion))
+                siguiente += 1
+            
+            texto_pagina = pendientes.popleft().result()
             texto_total.append(texto_pagina)
             
             progreso = (i + 1) / total_paginas
@@ -117,9 +161,16 @@ def extraer_texto_pdf_ocr(archivo_pdf, es_doble_pagina=True, auto_rotar=True):
         # Post-procesado: quitar cabeceras/pie de página repetidos, saltar índice y detectar captions
         texto_procesado = post_process_extracted_text(texto_completo)
         return texto_procesado
+    except SobrecargaError:
+        st.error("El servidor está saturado en este momento. Inténtalo de nuevo en unos minutos.")
+        return ""
     except Exception as e:
         st.error(f"Error al abrir o procesar PDF: {e}")
         return ""
+    finally:
+        # Si la sesión se interrumpe, no dejar páginas en cola para nadie
+        for futuro in pendientes:
+            futuro.cancel()
 
 def extraer_texto_documento(archivo_subido):
     """Extrae texto de DOCX, TXT o PDF digital."""
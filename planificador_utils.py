@@ -0,0 +1,181 @@
+# planificador_utils.py
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# ================= CONFIGURACIÓN =================
+# Todas las sesiones de Streamlit corren en el mismo proceso, así que estos
+# límites son para todo el servidor, no por usuario.
+MAX_TRABAJADORES_OCR = max(1, (os.cpu_count() or 2) - 1)
+MAX_TRABAJADORES_TTS = 4
+MAX_COLA = 2000 # Tareas en espera por pool antes de rechazar trabajo nuevo
+MEMORIA_MINIMA_MB = 300 # Por debajo, cada pool ejecuta una sola tarea a la vez
+
+class SobrecargaError(RuntimeError):
+    """El pool tiene la cola llena y no admite más trabajo."""
+
+# ================= UTILIDADES =================
+def memoria_disponible_mb():
+    """Memoria disponible del sistema en MB, o None si no se puede saber."""
+    try:
+        with open("/proc/meminfo") as f:
+            for linea in f:
+                if linea.startswith("MemAvailable:"):
+                    return int(linea.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def id_sesion_actual():
+    """Identificador de la sesión de Streamlit que está ejecutando el script."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            return ctx.session_id
+    except Exception:
+        pass
+    # Fuera de Streamlit (scripts, pruebas manuales) cada hilo cuenta como sesión
+    return f"hilo-{threading.get_ident()}"
+
+# ================= POOL CON REPARTO JUSTO =================
+class PoolJusto:
+    """Pool de hilos de tamaño fijo con una cola por sesión.
+
+    Los trabajadores atienden las sesiones por turnos (round-robin), de modo
+    que un libro de 500 páginas no bloquea a quien acaba de subir uno de 10.
+    """
+
+    def __init__(self, nombre, max_trabajadores, max_cola=MAX_COLA, memoria_minima_mb=MEMORIA_MINIMA_MB):
+        self.nombre = nombre
+        self.max_trabajadores = max_trabajadores
+        self.max_cola = max_cola
+        self.memoria_minima_mb = memoria_minima_mb
+
+        self._cond = threading.Condition()
+        self._colas = {} # sesión -> deque de tareas pendientes
+        self._turnos = deque() # sesiones con trabajo pendiente, en orden de turno
+        self._en_cola = 0
+        self._en_ejecucion = 0
+        self._iniciadas = 0
+        self._completadas = 0
+        self._rechazadas = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+        for i in range(max_trabajadores):
+            hilo = threading.Thread(target=self._trabajar, name=f"{nombre}-{i}", daemon=True)
+            hilo.start()
+
+    def enviar(self, fn, *args, sesion=None, **kwargs):
+        """Encola `fn(*args, **kwargs)` para la sesión y devuelve un Future."""
+        if sesion is None:
+            sesion = id_sesion_actual()
+
+        futuro = Future()
+        with self._cond:
+            if self._en_cola >= self.max_cola:
+                self._rechazadas += 1
+                raise SobrecargaError(f"Cola de {self.nombre} llena ({self._en_cola} tareas en espera)")
+
+            cola = self._colas.get(sesion)
+            if cola is None:
+                cola = self._colas[sesion] = deque()
+                self._turnos.append(sesion)
+            cola.append((futuro, fn, args, kwargs, time.monotonic()))
+            self._en_cola += 1
+            self._cond.notify()
+        return futuro
+
+    def metricas(self):
+        """Estado actual del pool (profundidad de cola, tiempos de espera...)."""
+        with self._cond:
+            return {
+                "trabajadores": self.max_trabajadores,
+                "en_cola": self._en_cola,
+                "en_ejecucion": self._en_ejecucion,
+                "sesiones": len(self._colas),
+                "completadas": self._completadas,
+                "rechazadas": self._rechazadas,
+                "espera_media_s": self._espera_total / self._iniciadas if self._iniciadas else 0.0,
+                "espera_max_s": self._espera_max,
+            }
+
+    def _puede_admitir(self):
+        """Con poca memoria solo se deja correr una tarea para no agotarla."""
+        if self._en_ejecucion == 0:
+            return True
+        disponible = memoria_disponible_mb()
+        return disponible is None or disponible >= self.memoria_minima_mb
+
+    def _siguiente(self):
+        """Saca la siguiente tarea respetando el turno entre sesiones."""
+        sesion = self._turnos.popleft()
+        cola = self._colas[sesion]
+        tarea = cola.popleft()
+        if cola:
+            self._turnos.append(sesion)
+        else:
+            del self._colas[sesion]
+        self._en_cola -= 1
+        return tarea
+
+    def _trabajar(self):
+        while True:
+            with self._cond:
+                while not (self._en_cola and self._puede_admitir()):
+                    # Si hay cola pero falta memoria, reintentar periódicamente
+                    self._cond.wait(timeout=0.5 if self._en_cola else None)
+
+                futuro, fn, args, kwargs, encolado = self._siguiente()
+                if not futuro.set_running_or_notify_cancel():
+                    # La sesión canceló la tarea mientras esperaba
+                    continue
+
+                espera = time.monotonic() - encolado
+                self._iniciadas += 1
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+                self._en_ejecucion += 1
+
+            try:
+                futuro.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                futuro.set_exception(e)
+            finally:
+                with self._cond:
+                    self._en_ejecucion -= 1
+                    self._completadas += 1
+                    self._cond.notify_all()
+
+class PlanificadorRecursos:
+    """Pools compartidos de OCR y TTS para todas las sesiones del servidor."""
+
+    def __init__(self):
+        self.ocr = PoolJusto("ocr", MAX_TRABAJADORES_OCR)
+        self.tts = PoolJusto("tts", MAX_TRABAJADORES_TTS)
+
+    def metricas(self):
+        return {
+            "ocr": self.ocr.metricas(),
+            "tts": self.tts.metricas(),
+            "memoria_disponible_mb": memoria_disponible_mb(),
+        }
+
+_planificador = None
+_bloqueo_planificador = threading.Lock()
+
+def obtener_planificador():
+    """Devuelve el planificador único del servidor (compartido entre sesiones).
+
+    Se guarda en una variable de módulo y no en st.cache_resource: limpiar la
+    caché crearía pools nuevos mientras los hilos de los antiguos siguen vivos,
+    duplicando el límite de trabajadores.
+    """
+    global _planificador
+    with _bloqueo_planificador:
+        if _planificador is None:
+            _planificador = PlanificadorRecursos()
+        return _planificador
@@ -0,0 +1,125 @@
+# preproceso_utils.py
+import numpy as np
+from PIL import Image
+
+# ================= CONFIGURACIÓN =================
+# Binarización adaptativa de Sauvola (ventana en píxeles del render a zoom 2)
+VENTANA_SAUVOLA = 31
+K_SAUVOLA = 0.2
+R_SAUVOLA = 128.0
+
+# Página en blanco: sin contraste (render digital vacío) o sin zonas con tinta
+# densa. No se usa la fracción de tinta de toda la página, que descartaría
+# páginas con solo un título de capítulo o una línea final.
+DESVIACION_MINIMA_BLANCO = 1.0
+BLOQUE_BLANCO = 16 # Lado en píxeles de los bloques en que se divide la página
+DENSIDAD_TINTA_BLOQUE = 0.05 # Un bloque "tiene tinta" con al menos un 5 % de píxeles oscuros
+MIN_BLOQUES_TINTA = 4 # Por debajo es ruido, motas o un número de página suelto
+
+# Enderezado fino (la rotación de 90/180° la corrige el OSD de Tesseract)
+ANGULO_MAX_ENDEREZADO = 3.0
+PASO_ANGULO_ENDEREZADO = 0.25
+MAX_PUNTOS_ENDEREZADO = 200_000
+
+# ================= OPERACIONES BÁSICAS =================
+def a_grises(img):
+    """Convierte una imagen PIL a un array float32 en escala de grises (0-255)."""
+    if img.mode == "L":
+        return np.asarray(img, dtype=np.float32)
+    rgb = np.asarray(img.convert("RGB"), dtype=np.float32)
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+def _media_desviacion_local(gris, ventana):
+    """Media y desviación típica en una ventana cuadrada usando imágenes integrales."""
+    radio = ventana // 2
+    ventana = 2 * radio + 1
+    alto, ancho = gris.shape
+
+    relleno = np.pad(gris.astype(np.float64), radio, mode="edge")
+    integral = np.zeros((relleno.shape[0] + 1, relleno.shape[1] + 1))
+    integral[1:, 1:] = relleno.cumsum(0).cumsum(1)
+    integral2 = np.zeros_like(integral)
+    integral2[1:, 1:] = (relleno ** 2).cumsum(0).cumsum(1)
+
+    def suma_ventana(ii):
+        return (ii[ventana:ventana + alto, ventana:ventana + ancho] - ii[:alto, ventana:ventana + ancho]
+                - ii[ventana:ventana + alto, :ancho] + ii[:alto, :ancho])
+
+    area = ventana * ventana
+    media = suma_ventana(integral) / area
+    varianza = np.maximum(suma_ventana(integral2) / area - media ** 2, 0)
+    return media, np.sqrt(varianza)
+
+def binarizar(gris, ventana=VENTANA_SAUVOLA, k=K_SAUVOLA, r=R_SAUVOLA):
+    """Binarización adaptativa (Sauvola). Devuelve un array bool: True = fondo."""
+    media, desviacion = _media_desviacion_local(gris, ventana)
+    umbral = media * (1 + k * (desviacion / r - 1))
+    return gris > umbral
+
+def es_pagina_en_blanco(gris, fondo=None):
+    """Detecta páginas (o medias páginas) en blanco o casi en blanco.
+
+    El ruido del escaneo deja píxeles oscuros sueltos repartidos por la hoja;
+    el texto, aunque sea una sola palabra, llena varios bloques pequeños.
+    """
+    if gris.std() < DESVIACION_MINIMA_BLANCO:
+        return True
+    if fondo is None:
+        fondo = binarizar(gris)
+
+    tinta = ~fondo
+    alto = tinta.shape[0] // BLOQUE_BLANCO * BLOQUE_BLANCO
+    ancho = tinta.shape[1] // BLOQUE_BLANCO * BLOQUE_BLANCO
+    bloques = tinta[:alto, :ancho].reshape(
+        alto // BLOQUE_BLANCO, BLOQUE_BLANCO, ancho // BLOQUE_BLANCO, BLOQUE_BLANCO
+    )
+    densidad = bloques.mean(axis=(1, 3))
+    return int((densidad >= DENSIDAD_TINTA_BLOQUE).sum()) < MIN_BLOQUES_TINTA
+
+def estimar_inclinacion(fondo):
+    """Estima el ángulo (grados) que endereza las líneas de texto.
+
+    Prueba ángulos pequeños y se queda con el que da el perfil de
+    proyección horizontal más "picudo" (líneas de texto bien alineadas).
+    """
+    filas, columnas = np.nonzero(~fondo[::2, ::2])
+    if len(filas) < 100:
+        return 0.0
+    if len(filas) > MAX_PUNTOS_ENDEREZADO:
+        indices = np.random.default_rng(0).choice(len(filas), MAX_PUNTOS_ENDEREZADO, replace=False)
+        filas, columnas = filas[indices], columnas[indices]
+    filas = filas.astype(np.float64)
+    columnas = columnas.astype(np.float64)
+
+    mejor_angulo, mejor_puntuacion = 0.0, -1.0
+    angulos = np.arange(-ANGULO_MAX_ENDEREZADO, ANGULO_MAX_ENDEREZADO + 1e-9, PASO_ANGULO_ENDEREZADO)
+    for angulo in angulos:
+        proyeccion = filas - columnas * np.tan(np.radians(angulo))
+        perfil = np.bincount(np.round(proyeccion - proyeccion.min()).astype(np.int64))
+        puntuacion = float(np.dot(perfil, perfil))
+        if puntuacion > mejor_puntuacion:
+            mejor_angulo, mejor_puntuacion = float(angulo), puntuacion
+    return mejor_angulo
+
+# ================= ETAPA COMPLETA =================
+def preprocesar_imagen(img):
+    """Prepara una imagen de página para Tesseract.
+
+    Devuelve None si la página está en blanco (no hace falta OCR) o una
+    imagen PIL en modo "1" (binarizada y enderezada) en caso contrario.
+    """
+    gris = a_grises(img)
+    if gris.std() < DESVIACION_MINIMA_BLANCO:
+        return None
+
+    fondo = binarizar(gris)
+    if es_pagina_en_blanco(gris, fondo):
+        return None
+
+    binaria = Image.fromarray(fondo)
+    angulo = estimar_inclinacion(fondo)
+    if abs(angulo) >= PASO_ANGULO_ENDEREZADO:
+        # Rotar en gris y volver a umbralizar para no dejar bordes dentados
+        rotada = binaria.convert("L").rotate(angulo, resample=Image.BILINEAR, fillcolor=255)
+        binaria = Image.fromarray(np.asarray(rotada) > 127)
+    return binaria
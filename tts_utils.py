@@ -3,8 +3,19 @@ import asyncio
 import edge_tts
 import tempfile
 import os
+import html
+import shutil
 import streamlit as st
 from ocr_utils import limpiar_texto # Importar la función de limpieza
+from almacen_utils import (
+    salidas_accesibles,
+    registrar_salida,
+    reservar_salida,
+    finalizar_salida,
+    url_salida,
+    TIPOS_CONTENIDO
+)
+from planificador_utils import obtener_planificador, id_sesion_actual, SobrecargaError
 import sys
 
 VOCES = {
@@ -16,57 +27,90 @@ VOCES = {
     "🇺🇸 Aria (Inglés USA)": "en-US-AriaNeural",
 }
 
-async def generar_audio_async(texto_limpio, voz_codigo, pydub_ok):
-    """Función asíncrona para generar el audio usando edge-tts."""
+def sintetizar_fragmento(texto, voz_codigo, ruta_salida):
+    """Sintetiza un texto a MP3 con edge-tts. Se ejecuta en un hilo del pool TTS."""
+    comunicador = edge_tts.Communicate(texto, voz_codigo)
+    asyncio.run(comunicador.save(ruta_salida))
+    return ruta_salida
+
+def _borrar_si_existe(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+async def generar_audio_async(texto_limpio, voz_codigo, pydub_ok, al_completar_fragmento=None, ruta_final=None):
+    """Función asíncrona para generar el audio usando edge-tts.
+
+    El MP3 se escribe en `ruta_final` (o en un temporal) a medida que se genera.
+    Si se indica `al_completar_fragmento(indice, total)`, se llama cada vez que
+    termina un fragmento del texto largo, ya anexado al audio final.
+    """
     
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-        ruta_final = tmp.name
+    if ruta_final is None:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
+            ruta_final = tmp.name
     
     # Chunking: Dividir texto para evitar límites de TTS
     MAX_CHARS = 8000
     
     try:
-        # Importar pydub de forma perezosa para evitar fallos en import global
-        AudioSegment = None
-        if pydub_ok:
-            try:
-                from pydub import AudioSegment as _AudioSegment
-                AudioSegment = _AudioSegment
-            except Exception as ie:
-                # Si falla la importación, desactivar funcionalidades relacionadas
-                st.warning(f"Advertencia: falló la importación de pydub ({ie}). Se usará modo sin unión de partes.")
-                AudioSegment = None
-
-        if len(texto_limpio) > MAX_CHARS and AudioSegment is not None:
+        if len(texto_limpio) > MAX_CHARS:
             st.info(f"El texto es largo ({len(texto_limpio):,} caracteres). Dividiendo para unificar el audio...")
 
             # Dividir por bloques de caracteres, no por oraciones, para Edge TTS
             partes = [texto_limpio[i:i + MAX_CHARS] for i in range(0, len(texto_limpio), MAX_CHARS)]
-            audio_completo = AudioSegment.empty()
 
-            # Generar y unir partes
-            for i, parte in enumerate(partes):
-                st.text(f"Procesando fragmento {i+1}/{len(partes)}...")
-                comunicador = edge_tts.Communicate(parte, voz_codigo)
-                ruta_parte = f"{ruta_final}_parte{i}.mp3"
-                await comunicador.save(ruta_parte) # Bloquea el thread hasta que se guarda
+            # Encolar todas las partes en el pool TTS compartido; el planificador
+            # reparte los trabajadores entre sesiones y aquí se esperan en orden.
+            pool = obtener_planificador().tts
+            sesion = id_sesion_actual()
+            rutas_partes = [f"{ruta_final}_parte{i}.mp3" for i in range(len(partes))]
+            futuros = []
+            consumidas = 0
+
+            try:
+                for parte, ruta_parte in zip(partes, rutas_partes):
+                    futuros.append(pool.enviar(sintetizar_fragmento, parte, voz_codigo, ruta_parte, sesion=sesion))
 
-                audio = AudioSegment.from_mp3(ruta_parte)
-                audio_completo += audio
-                os.remove(ruta_parte)
+                # Anexar cada parte al MP3 final a medida que termina.
+                # Los fragmentos MP3 de edge-tts se pueden concatenar byte a byte,
+                # así no hace falta decodificar todo el audiolibro en memoria.
+                with open(ruta_final, "wb") as salida:
+                    for i, (futuro, ruta_parte) in enumerate(zip(futuros, rutas_partes)):
+                        await asyncio.wrap_future(futuro)
 
-            audio_completo.export(ruta_final, format="mp3")
+                        with open(ruta_parte, "rb") as f_parte:
+                            shutil.copyfileobj(f_parte, salida)
+                        salida.flush()
+                        consumidas += 1
+                        os.remove(ruta_parte)
+
+                        if al_completar_fragmento is not None:
+                            al_completar_fragmento(i, len(partes))
+            finally:
+                # Si algo falla o la sesión se interrumpe, liberar el pool y el disco
+                for futuro in futuros[consumidas:]:
+                    futuro.cancel()
+                for futuro, ruta_parte in zip(futuros[consumidas:], rutas_partes[consumidas:]):
+                    if not futuro.cancelled():
+                        futuro.add_done_callback(lambda _, ruta=ruta_parte: _borrar_si_existe(ruta))
 
         else:
-            if len(texto_limpio) > MAX_CHARS and AudioSegment is None:
-                st.warning(f"pydub no está disponible. Limitando a los primeros {MAX_CHARS} caracteres.")
-                texto_a_tts = texto_limpio[:MAX_CHARS]
-            else:
-                texto_a_tts = texto_limpio
+            texto_a_tts = texto_limpio
 
             # Si estamos en Windows y pyttsx3 está disponible, permitir usar la voz local de Windows
             use_local_windows = (os.name == 'nt')
             if use_local_windows:
+                # pydub solo hace falta aquí, para pasar el WAV de Windows a MP3.
+                # Se importa de forma perezosa para evitar fallos en import global
+                AudioSegment = None
+                if pydub_ok:
+                    try:
+                        from pydub import AudioSegment
+                    except Exception as ie:
+                        st.warning(f"Advertencia: falló la importación de pydub ({ie}). El audio se guardará en WAV.")
+                        AudioSegment = None
                 try:
                     import pyttsx3
                     # Usar pyttsx3 para exportar a WAV y convertir si pydub está disponible
@@ -87,11 +131,15 @@ async def generar_audio_async(texto_limpio, voz_codigo, pydub_ok):
                     # Si falla pyttsx3 o no está, caer a edge-tts
                     pass
 
-            comunicador = edge_tts.Communicate(texto_a_tts, voz_codigo)
-            await comunicador.save(ruta_final)
+            futuro = obtener_planificador().tts.enviar(sintetizar_fragmento, texto_a_tts, voz_codigo, ruta_final)
+            await asyncio.wrap_future(futuro)
 
         return ruta_final
 
+    except SobrecargaError:
+        st.error("El servidor está saturado en este momento. Inténtalo de nuevo en unos minutos.")
+        _borrar_si_existe(ruta_final)
+        return None
     except Exception as e:
         st.error(f"Error generando audio: {e}")
         # Limpieza si falla
@@ -99,6 +147,14 @@ async def generar_audio_async(texto_limpio, voz_codigo, pydub_ok):
             os.remove(ruta_final)
         return None
 
+def mostrar_reproductor(url_audio, precargar=True):
+    """Muestra un reproductor HTML que carga el audio por URL (admite Range/seek)."""
+    precarga = "metadata" if precargar else "none"
+    st.markdown(
+        f'<audio controls preload="{precarga}" style="width: 100%;" src="{html.escape(url_audio)}"></audio>',
+        unsafe_allow_html=True
+    )
+
 def generar_audio(texto, voz_codigo, nombre_base, pydub_ok):
     """Llamada principal para generar y descargar el audio."""
     
@@ -108,30 +164,81 @@ def generar_audio(texto, voz_codigo, nombre_base, pydub_ok):
         st.error("Texto insuficiente para generar audio.")
         return
         
-    with st.spinner("Generando audio... (Puede tardar si es un texto largo)"):
-        # edge-tts es asíncrono, necesitamos ejecutarlo con asyncio.run()
-        ruta_audio = asyncio.run(generar_audio_async(texto_limpio, voz_codigo, pydub_ok))
+    barra = st.progress(0.0, "🔊 Generando audio...")
+    
+    # Reproducción progresiva: el MP3 se escribe directamente en el almacén y
+    # un único reproductor lo escucha en directo mientras sigue creciendo.
+    # Solo si el navegador llega al servidor de salidas; si no, basta la barra de progreso.
+    almacen_ok = salidas_accesibles()
+    nombre_directo, ruta_directo = reservar_salida(".mp3") if almacen_ok else (None, None)
+    # Hueco del reproductor: el de directo se sustituye por el completo al terminar
+    reproductor = st.empty()
+    if almacen_ok:
+        with reproductor.container():
+            st.caption("🎧 Puedes empezar a escuchar mientras se genera el resto:")
+            mostrar_reproductor(url_salida(nombre_directo, en_directo=True), precargar=False)
+    
+    def al_completar_fragmento(indice, total):
+        barra.progress((indice + 1) / total, f"🔊 Fragmento {indice + 1}/{total} listo")
+    
+    try:
+        with st.spinner("Generando audio... (Puede tardar si es un texto largo)"):
+            # edge-tts es asíncrono, necesitamos ejecutarlo con asyncio.run()
+            ruta_audio = asyncio.run(
+                generar_audio_async(texto_limpio, voz_codigo, pydub_ok, al_completar_fragmento, ruta_directo)
+            )
+    finally:
+        # Cierra la emisión en directo aunque la generación falle o se interrumpa
+        if nombre_directo:
+            finalizar_salida(nombre_directo)
     
     if ruta_audio and os.path.exists(ruta_audio):
+        barra.progress(1.0, "✅ Audio completo")
         st.success("✅ Audiolibro generado")
         
-        # Reproductor
-        st.audio(ruta_audio, format="audio/mp3")
+        extension = os.path.splitext(ruta_audio)[1]
+        nombre_descarga = os.path.splitext(nombre_base)[0] + "_audiolibro" + extension
         
-        # Descarga
-        with open(ruta_audio, "rb") as f:
-            nombre_descarga = os.path.splitext(nombre_base)[0] + "_audiolibro.mp3"
-            st.download_button(
-                "⬇️ Descargar MP3",
-                f.read(),
-                nombre_descarga,
-                "audio/mp3",
-                use_container_width=True,
-                key="dl_audio"
+        if almacen_ok:
+            # Servir el audio por referencia desde el almacén de salidas (sin leerlo en memoria).
+            # Normalmente ya está allí; la voz local de Windows puede devolver otro archivo.
+            if ruta_audio == ruta_directo:
+                nombre = nombre_directo
+            else:
+                nombre = registrar_salida(ruta_audio)
+                # El .mp3 reservado quedó vacío (p. ej. la voz de Windows dejó un WAV)
+                if ruta_directo:
+                    _borrar_si_existe(ruta_directo)
+            
+            # Reproductor completo (admite avance/retroceso) en lugar del de directo
+            with reproductor.container():
+                st.caption("Audio completo:")
+                mostrar_reproductor(url_salida(nombre))
+            
+            # Descarga
+            st.markdown(
+                f'<a href="{html.escape(url_salida(nombre, nombre_descarga))}">'
+                f'⬇️ Descargar {extension[1:].upper()}</a>',
+                unsafe_allow_html=True
             )
-        
-        os.remove(ruta_audio)
+        else:
+            # Sin servidor de salidas: reproductor y descarga de Streamlit (en memoria)
+            tamano_mb = os.path.getsize(ruta_audio) / (1024 * 1024)
+            if tamano_mb > 200:
+                st.warning(f"El audio ocupa {tamano_mb:.0f} MB; la descarga puede tardar o fallar.")
+            st.audio(ruta_audio, format=TIPOS_CONTENIDO.get(extension, "audio/mpeg"))
+            with open(ruta_audio, "rb") as f:
+                st.download_button(
+                    f"⬇️ Descargar {extension[1:].upper()}",
+                    f.read(),
+                    nombre_descarga,
+                    TIPOS_CONTENIDO.get(extension, "audio/mpeg"),
+                    use_container_width=True,
+                    key="dl_audio"
+                )
+            os.remove(ruta_audio)
     else:
+        reproductor.empty()
         st.error("Error generando audio.")
         
     return texto_limpio # Devolvemos el texto limpio para métricas
\ No newline at end of file